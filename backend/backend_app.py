@@ -1,34 +1,492 @@
-import json
-from flask import Flask, jsonify, request
+import contextlib
+import logging
+import mmap
+import os
+import queue
+import threading
+from functools import lru_cache
+from itertools import compress, repeat
+from operator import contains, itemgetter
+from urllib.parse import parse_qsl
+
+try:
+    import fcntl
+except ImportError:  # Windows: mutations are only serialized within one process.
+    fcntl = None
+
+import msgpack
+import orjson
+from flask import Flask, Response, jsonify, request
 from flask_cors import CORS
 
 app = Flask(__name__)
 CORS(app)
 
-POSTS_FILE = "posts.json"
+logger = logging.getLogger(__name__)
+
+POSTS_FILE = "posts.msgpack"
+# Posts file of earlier versions, converted to POSTS_FILE on first read.
+LEGACY_POSTS_FILE = "posts.json"
+POSTS_LOG = "posts.log"
+# Lock file serializing mutations across worker processes sharing the files.
+LOCK_FILE = "posts.lock"
+# Fields the posts list can be sorted by.
+SORT_FIELDS = frozenset({"title", "content", "id"})
+SORT_DIRECTIONS = frozenset({"asc", "desc"})
+# Buffer size used for reading and writing the posts and log files.
+IO_BUFFER_SIZE = 64 * 1024
+# Posts files larger than this many bytes are unpacked straight from a memory
+# map instead of being read into a temporary bytes object first. The unpacked
+# posts are still copied into each worker's own memory.
+MMAP_THRESHOLD = 100 * 1024
+# Once the change log grows past this many bytes it is folded into POSTS_FILE.
+COMPACT_THRESHOLD = 64 * 1024
+
+# In-memory copy of the posts, re-read only when the files change on disk.
+_cache = None
+_cache_stamp = None
+_cache_lock = threading.RLock()
+# Bytes of the change log already applied to the cache; when only the log
+# has grown, just the lines after this offset are replayed.
+_log_offset = 0
+# Serializes mutations between threads; LOCK_FILE does so between processes.
+_write_mutex = threading.RLock()
+_write_lock_depth = 0
+# Mutations are applied one at a time by a single writer thread fed from this
+# queue; requests wait up to MUTATION_TIMEOUT seconds for their result.
+MUTATION_TIMEOUT = 10
+_mutation_queue = queue.Queue()
+_writer_thread = None
+_writer_start_lock = threading.Lock()
+# Lookup of cached posts by id, and the id the next added post will get.
+_id_index = {}
+_next_id = 1
+# Casefolded title and content of each cached post, keyed by id in list order,
+# so search does not casefold every post on every request. The search index
+# below is built by the first search after the cache is (re)loaded, and is None
+# until then, so listing and mutating posts never pay for it.
+_search_index = None
+# Trigram inverted index over the casefolded title and content: for each field,
+# a mapping of every 3-character substring to the ids of the posts containing it.
+TRIGRAM_SIZE = 3
+_trigrams = None
+# Column-wise (titles, contents, posts) snapshot of _search_index for scanning
+# every post; built on first use and dropped whenever the index changes.
+_search_columns = None
+# Insertion order of each cached post, used to return search hits in list order.
+_positions = None
+_next_position = 0
+# Number of posts serialized per chunk of a streamed response.
+STREAM_CHUNK_SIZE = 256
+# Serialized GET /api/posts bodies keyed by (sort field, reverse), valid for
+# the posts identified by _get_cache_version (an ETag from _posts_etag()).
+_get_cache = {}
+_get_cache_version = None
+
+
+def _file_stamp():
+    """
+    Returns a value identifying the current on-disk state of the posts
+    file and the change log, used to decide if the cache is still valid.
+    """
+    stamp = []
+    for path in (POSTS_FILE, POSTS_LOG):
+        try:
+            st = os.stat(path)
+            stamp.append((st.st_mtime_ns, st.st_size))
+        except FileNotFoundError:
+            stamp.append(None)
+    return tuple(stamp)
+
+
+@contextlib.contextmanager
+def _write_lock():
+    """
+    Serializes mutations between threads and, through an exclusive lock on
+    LOCK_FILE, between worker processes. Can be nested within one thread.
+    It does not hold _cache_lock: writers take that only around in-memory
+    updates, so readers are never blocked by file locking or disk syncs.
+    """
+    global _write_lock_depth
+    with _write_mutex:
+        if fcntl is None or _write_lock_depth:
+            _write_lock_depth += 1
+            try:
+                yield
+            finally:
+                _write_lock_depth -= 1
+            return
+        with open(LOCK_FILE, "a") as lock_file:
+            fcntl.flock(lock_file, fcntl.LOCK_EX)
+            _write_lock_depth += 1
+            try:
+                yield
+            finally:
+                _write_lock_depth -= 1
+                fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+
+def _posts_etag():
+    """
+    Returns an entity tag for the current posts, derived from the on-disk
+    state of the posts file and change log so that it changes on every
+    mutation and is the same in every process serving the same files.
+    """
+    with _cache_lock:
+        read_posts()
+        stamp = _cache_stamp
+    return "-".join(
+        "0" if part is None else f"{part[0]:x}.{part[1]:x}" for part in stamp
+    )
+
+
+def _set_cache(posts):
+    """
+    Replaces the cached posts, rebuilds the id lookup from them and drops
+    the search index until the next search needs it.
+
+    Args:
+        posts (list): List of posts to cache.
+    """
+    global _cache, _id_index, _next_id, _search_index, _search_columns, _trigrams, _positions
+    _cache = posts
+    _id_index = {post["id"]: post for post in posts}
+    _next_id = max(_id_index, default=0) + 1
+    _search_index = None
+    _search_columns = None
+    _trigrams = None
+    _positions = None
+
+
+def _build_search_index():
+    """
+    Builds the search index for the cached posts if it is not built yet.
+    Must be called while holding _cache_lock.
+    """
+    global _search_index, _trigrams, _positions, _next_position
+    if _search_index is not None:
+        return
+    _search_index = {}
+    _trigrams = ({}, {})
+    _positions = {}
+    _next_position = 0
+    for post in _cache:
+        _index_post(post)
+
+
+def _search_entry(post):
+    """
+    Returns the search index entry for a post: its casefolded title and
+    content, followed by the post itself.
+    """
+    # Kept as str rather than encoded bytes: CPython already stores ASCII and
+    # Latin-1 text with one byte per character, and str containment measured
+    # faster than bytes containment on the UTF-8 encoded fields.
+    # str() keeps posts with non-text fields from older change logs searchable.
+    return str(post["title"]).casefold(), str(post["content"]).casefold(), post
+
 
+def _trigrams_of(text):
+    """
+    Returns the set of overlapping 3-character substrings of a string.
+    """
+    return {text[i:i + TRIGRAM_SIZE] for i in range(len(text) - TRIGRAM_SIZE + 1)}
+
+
+def _index_post(post):
+    """
+    Adds a post to the search index, replacing any previous entry for its id.
+    Does nothing while the search index is not built.
+    Must be called while holding _cache_lock.
+
+    Args:
+        post (dict): The cached post.
+    """
+    global _next_position, _search_columns
+    if _search_index is None:
+        return
+    _search_columns = None
+    post_id = post["id"]
+    previous = _search_index.get(post_id)
+    if previous is not None:
+        _remove_trigrams(post_id, previous)
+    entry = _search_entry(post)
+    _search_index[post_id] = entry
+    for field, trigram_index in enumerate(_trigrams):
+        for trigram in _trigrams_of(entry[field]):
+            trigram_index.setdefault(trigram, set()).add(post_id)
+    if post_id not in _positions:
+        _positions[post_id] = _next_position
+        _next_position += 1
+
+
+def _unindex_post(post_id):
+    """
+    Removes a post from the search index, if it is indexed.
+    Does nothing while the search index is not built.
+    Must be called while holding _cache_lock.
+
+    Args:
+        post_id (int): ID of the post.
+    """
+    global _search_columns
+    if _search_index is None:
+        return
+    _search_columns = None
+    entry = _search_index.pop(post_id, None)
+    if entry is not None:
+        _remove_trigrams(post_id, entry)
+        del _positions[post_id]
+
+
+def _remove_trigrams(post_id, entry):
+    """
+    Removes a post's id from the trigram postings of its search index entry.
+    """
+    for field, trigram_index in enumerate(_trigrams):
+        for trigram in _trigrams_of(entry[field]):
+            ids = trigram_index[trigram]
+            ids.discard(post_id)
+            if not ids:
+                del trigram_index[trigram]
+
+
+def _get_search_columns():
+    """
+    Returns the casefolded titles, casefolded contents and posts of the
+    search index as three parallel lists, building them if the index changed.
+    The lists are shared between requests and must not be modified.
+    Must be called while holding _cache_lock.
+    """
+    global _search_columns
+    if _search_columns is None:
+        entries = _search_index.values()
+        _search_columns = (
+            [entry[0] for entry in entries],
+            [entry[1] for entry in entries],
+            [entry[2] for entry in entries],
+        )
+    return _search_columns
+
+
+def _search_candidates(queries):
+    """
+    Looks up the posts that contain every trigram of the given queries.
+    Posts in the result may still not contain the queries themselves, so
+    callers have to verify each candidate.
+    Must be called while holding _cache_lock.
+
+    Args:
+        queries (tuple): Casefolded title and content query.
+
+    Returns:
+        list: Search index entries of the candidate posts, in list order,
+        or None if no query is long enough to use the index.
+    """
+    postings = []
+    for field, query in enumerate(queries):
+        if len(query) >= TRIGRAM_SIZE:
+            for trigram in _trigrams_of(query):
+                postings.append(_trigrams[field].get(trigram, set()))
+    if not postings:
+        return None
+
+    postings.sort(key=len)
+    ids = set(postings[0])
+    for posting in postings[1:]:
+        if not ids:
+            break
+        ids &= posting
+    return [_search_index[post_id] for post_id in sorted(ids, key=_positions.__getitem__)]
+
+
+def apply_op(posts, id_index, op):
+    """
+    Applies a single change log operation to a list of posts in place.
+
+    Args:
+        posts (list): List of posts to modify.
+        id_index (dict): Lookup of the same posts by id, kept in sync.
+        op (dict): Operation with an 'op' key of 'add', 'update' or 'delete'.
+    """
+    if op["op"] == "add":
+        # Skip adds already folded into the posts file by an interrupted compaction.
+        if op["post"]["id"] not in id_index:
+            posts.append(op["post"])
+            id_index[op["post"]["id"]] = op["post"]
+    elif op["op"] == "update":
+        post = id_index.get(op["post"]["id"])
+        if post is not None:
+            post.update(op["post"])
+    elif op["op"] == "delete":
+        post = id_index.pop(op["id"], None)
+        if post is not None:
+            posts.remove(post)
+
+
+def get_post(id):
+    """
+    Looks up a single post by its ID.
+
+    Args:
+        id (int): ID of the post.
+
+    Returns:
+        dict: The post, or None if there is no post with this ID.
+    """
+    with _cache_lock:
+        read_posts()
+        return _id_index.get(id)
+
+
+def _read_log(offset):
+    """
+    Reads the operations in the change log after the given byte offset.
+    A torn last line from an interrupted write is left unread and malformed
+    lines are skipped.
+
+    Args:
+        offset (int): Offset of the first line to read.
+
+    Returns:
+        tuple: The operations read and the offset just past the last complete line.
+    """
+    ops = []
+    try:
+        with open(POSTS_LOG, "rb", buffering=IO_BUFFER_SIZE) as log:
+            log.seek(offset)
+            for line in log:
+                if not line.endswith(b"\n"):
+                    break
+                offset += len(line)
+                try:
+                    ops.append(orjson.loads(line))
+                except orjson.JSONDecodeError:
+                    continue
+    except FileNotFoundError:
+        pass
+    return ops, offset
+
+
+def _apply_to_cache(op):
+    """
+    Applies one change log operation to the cached posts, the id lookup
+    and, if it is built, the search index. Malformed operations are skipped.
+    Must be called while holding _cache_lock.
+
+    Args:
+        op (dict): Operation as accepted by apply_op().
+    """
+    global _next_id
+    try:
+        apply_op(_cache, _id_index, op)
+        if op["op"] == "delete":
+            _unindex_post(op["id"])
+        elif op["post"]["id"] in _id_index:
+            post_id = op["post"]["id"]
+            _index_post(_id_index[post_id])
+            if op["op"] == "add":
+                _next_id = max(_next_id, post_id + 1)
+    except (KeyError, TypeError):
+        pass
 
 
 def read_posts():
     """
-    Reads the list of posts from the JSON file.
+    Reads the list of posts from the posts file and replays the change log on top.
     If the file is not existing or is not valid, it returns empty list.
+    The result is cached in memory and only re-read when the files change
+    on disk; when only the change log has grown, just its new lines are
+    replayed. Callers must not modify the result directly; use append_op() instead.
 
     Returns:
         List of posts.
     """
+    global _cache_stamp, _log_offset
+    with _cache_lock:
+        stamp = _file_stamp()
+        if _cache is not None and stamp == _cache_stamp:
+            return _cache
+        if (_cache is not None and stamp[0] == _cache_stamp[0]
+                and stamp[1] is not None and stamp[1][1] >= _log_offset):
+            ops, _log_offset = _read_log(_log_offset)
+            for op in ops:
+                _apply_to_cache(op)
+            _cache_stamp = stamp
+            return _cache
+
+        if stamp[0] is None and os.path.exists(LEGACY_POSTS_FILE):
+            _migrate_legacy_posts()
+            stamp = _file_stamp()
+        try:
+            posts = _load_posts_file()
+        except (FileNotFoundError, ValueError):
+            posts = []
+        id_index = {post["id"]: post for post in posts}
+        ops, _log_offset = _read_log(0)
+        for op in ops:
+            try:
+                apply_op(posts, id_index, op)
+            except (KeyError, TypeError):
+                # A malformed operation is skipped.
+                continue
+        _set_cache(posts)
+        _cache_stamp = stamp
+        return _cache
+
+
+def _load_posts_file():
+    """
+    Loads the posts from the posts file, memory-mapping it when it is larger
+    than MMAP_THRESHOLD.
+
+    Returns:
+        List of posts.
+    """
+    with open(POSTS_FILE, "rb", buffering=IO_BUFFER_SIZE) as file:
+        if os.fstat(file.fileno()).st_size > MMAP_THRESHOLD:
+            with mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ) as mapped:
+                return msgpack.unpackb(mapped, raw=False)
+        return msgpack.unpackb(file.read(), raw=False)
+
+
+def _migrate_legacy_posts():
+    """
+    Converts the JSON posts file of earlier versions to POSTS_FILE.
+    The JSON file is left in place. The converted file is hard-linked into
+    place, which fails if POSTS_FILE already exists, so this needs no lock
+    and never overwrites posts written by another process.
+    """
     try:
-        with open(POSTS_FILE, "r") as file:
-            return json.load(file)
-    except FileNotFoundError:
-        return []
-    except json.JSONDecodeError:
-        return []
+        with open(LEGACY_POSTS_FILE, "rb", buffering=IO_BUFFER_SIZE) as file:
+            posts = orjson.loads(file.read())
+    except (FileNotFoundError, orjson.JSONDecodeError):
+        return
+    tmp_file = f"{POSTS_FILE}.{os.getpid()}.{threading.get_ident()}.tmp"
+    try:
+        with open(tmp_file, "wb", buffering=IO_BUFFER_SIZE) as file:
+            file.write(msgpack.packb(posts, use_bin_type=True))
+            file.flush()
+            os.fsync(file.fileno())
+        os.link(tmp_file, POSTS_FILE)
+        _fsync_dir(os.path.dirname(os.path.abspath(POSTS_FILE)))
+    except FileExistsError:
+        pass
+    except OSError as e:
+        logger.error("Error migrating %s to %s: %s", LEGACY_POSTS_FILE, POSTS_FILE, e)
+    finally:
+        try:
+            os.remove(tmp_file)
+        except OSError:
+            pass
 
 
 def write_posts(posts):
     """
-    Writes a list of posts to the JSON file.
+    Writes a list of posts to the posts file in MessagePack format.
+    The posts are written to a temporary file that then replaces the posts
+    file, so readers never see a partially written file.
+    Must be called while holding _write_lock().
 
     Args:
         posts (list): List of posts to write to the file.
@@ -36,15 +494,394 @@ def write_posts(posts):
     Returns:
         bool: True if writing is successful, False otherwise.
     """
+    global _cache_stamp
+    tmp_file = POSTS_FILE + ".tmp"
+    try:
+        with open(tmp_file, "wb", buffering=IO_BUFFER_SIZE) as file:
+            file.write(msgpack.packb(posts, use_bin_type=True))
+            file.flush()
+            os.fsync(file.fileno())
+        os.replace(tmp_file, POSTS_FILE)
+        _fsync_dir(os.path.dirname(os.path.abspath(POSTS_FILE)))
+        with _cache_lock:
+            if posts is not _cache:
+                _set_cache(posts)
+            _cache_stamp = _file_stamp()
+        return True
+    except Exception as e:
+        logger.error("Error writing to %s: %s", POSTS_FILE, e)
+        try:
+            os.remove(tmp_file)
+        except OSError:
+            pass
+        return False
+
+
+def _fsync_dir(path):
+    """
+    Flushes a directory entry to disk so a rename inside it survives a crash.
+    Does nothing on platforms that cannot open directories.
+    """
+    if not hasattr(os, "O_DIRECTORY"):
+        return
+    fd = os.open(path, os.O_RDONLY | os.O_DIRECTORY)
+    try:
+        os.fsync(fd)
+    finally:
+        os.close(fd)
+
+
+def compact():
+    """
+    Folds the change log into the posts file and truncates the log.
+
+    Returns:
+        bool: True if compaction is successful, False otherwise.
+    """
+    global _cache_stamp, _log_offset
+    with _write_lock():
+        posts = read_posts()
+        if not write_posts(posts):
+            return False
+        try:
+            open(POSTS_LOG, "w").close()
+        except Exception as e:
+            logger.error("Error truncating %s: %s", POSTS_LOG, e)
+            return False
+        with _cache_lock:
+            _log_offset = 0
+            _cache_stamp = _file_stamp()
+        return True
+
+
+def _complete_log_size(log):
+    """
+    Returns the size of the change log up to and including its last newline,
+    i.e. without a torn last line left behind by an interrupted write.
+
+    Args:
+        log: Change log opened for binary reading.
+    """
+    end = log.seek(0, os.SEEK_END)
+    if end == 0:
+        return 0
+    log.seek(end - 1)
+    if log.read(1) == b"\n":
+        return end
+    while end > 0:
+        start = max(0, end - IO_BUFFER_SIZE)
+        log.seek(start)
+        newline = log.read(end - start).rfind(b"\n")
+        if newline != -1:
+            return start + newline + 1
+        end = start
+    return 0
+
+
+def _append_log_line(line):
+    """
+    Appends one line to the change log and fsyncs it. A torn last line is cut
+    off first so the new line does not get glued onto it, and if the write
+    fails the log is truncated back to where it was.
+    Must be called while holding _write_lock().
+
+    Args:
+        line (bytes): Line to append, including the trailing newline.
+
+    Returns:
+        int: Offset in the log just past the appended line.
+    """
+    with open(POSTS_LOG, "a+b", buffering=0) as log:
+        start = _complete_log_size(log)
+        if start != log.seek(0, os.SEEK_END):
+            log.truncate(start)
+        try:
+            view = memoryview(line)
+            while view:
+                view = view[log.write(view):]
+            os.fsync(log.fileno())
+        except Exception:
+            log.truncate(start)
+            raise
+    return start + len(line)
+
+
+def append_op(op):
+    """
+    Appends one operation to the change log and applies it to the cached posts.
+    Compacts the log into the posts file once it grows past COMPACT_THRESHOLD.
+
+    Args:
+        op (dict): Operation as accepted by apply_op().
+
+    Returns:
+        bool: True if writing is successful, False otherwise.
+    """
+    global _cache_stamp, _log_offset
     try:
-        with open(POSTS_FILE, "w") as file:
-            json.dump(posts, file, indent=4)
+        with _write_lock():
+            read_posts()
+            end = _append_log_line(orjson.dumps(op) + b"\n")
+            # A reader may already have replayed this operation from disk;
+            # applying it again is harmless.
+            with _cache_lock:
+                _apply_to_cache(op)
+                _log_offset = end
+                _cache_stamp = _file_stamp()
+            if os.path.getsize(POSTS_LOG) > COMPACT_THRESHOLD:
+                compact()
         return True
     except Exception as e:
-        print(f"Error writing to {POSTS_FILE}: {e}")
+        logger.error("Error writing to %s: %s", POSTS_LOG, e)
         return False
 
 
+def _writer_loop():
+    """
+    Runs queued mutations one after another and hands back their results.
+    """
+    while True:
+        func, args, reply = _mutation_queue.get()
+        with reply["lock"]:
+            if reply["cancelled"]:
+                continue
+            reply["started"] = True
+        try:
+            reply["result"] = func(*args)
+        except Exception as e:
+            reply["error"] = e
+        finally:
+            reply["done"].set()
+
+
+def submit_mutation(func, *args):
+    """
+    Runs a mutation on the writer thread and waits for its result.
+    The writer thread is started on first use, so every worker process
+    started from a preloaded app gets its own. A mutation still queued
+    after MUTATION_TIMEOUT seconds is cancelled; one already running is
+    waited for, so a timeout always means the mutation was not applied.
+
+    Args:
+        func (callable): Mutation to run.
+        *args: Arguments for the mutation.
+
+    Returns:
+        The return value of the mutation.
+
+    Raises:
+        TimeoutError: If the mutation was cancelled because it did not start
+            within MUTATION_TIMEOUT seconds.
+    """
+    global _writer_thread
+    with _writer_start_lock:
+        if _writer_thread is None or not _writer_thread.is_alive():
+            _writer_thread = threading.Thread(target=_writer_loop, name="posts-writer", daemon=True)
+            _writer_thread.start()
+
+    reply = {"done": threading.Event(), "lock": threading.Lock(), "started": False, "cancelled": False}
+    _mutation_queue.put((func, args, reply))
+    if not reply["done"].wait(MUTATION_TIMEOUT):
+        with reply["lock"]:
+            if not reply["started"]:
+                reply["cancelled"] = True
+                raise TimeoutError("Timed out waiting for the posts to be saved.")
+        reply["done"].wait()
+    if "error" in reply:
+        raise reply["error"]
+    return reply["result"]
+
+
+def _add_post(title, content):
+    """
+    Adds a post with the next free id. Runs on the writer thread.
+
+    Returns:
+        dict: The new post.
+
+    Raises:
+        OSError: If the post could not be written to the change log.
+    """
+    with _write_lock():
+        read_posts()
+        new_post = {
+            "id": _next_id,
+            "title": title,
+            "content": content
+        }
+        if not append_op({"op": "add", "post": new_post}):
+            raise OSError("Could not save the post.")
+    return new_post
+
+
+def _update_post(id, title, content):
+    """
+    Replaces the title and content of a post. Runs on the writer thread.
+
+    Returns:
+        dict: The updated post, or None if there is no post with this ID.
+
+    Raises:
+        OSError: If the post could not be written to the change log.
+    """
+    with _write_lock():
+        if get_post(id) is None:
+            return None
+        post = {
+            "id": id,
+            "title": title,
+            "content": content
+        }
+        if not append_op({"op": "update", "post": post}):
+            raise OSError("Could not save the post.")
+    return post
+
+
+def _delete_post(id):
+    """
+    Deletes a post. Runs on the writer thread.
+
+    Returns:
+        bool: True if the post was deleted, False if there is no post with this ID.
+
+    Raises:
+        OSError: If the deletion could not be written to the change log.
+    """
+    with _write_lock():
+        if get_post(id) is None:
+            return False
+        if not append_op({"op": "delete", "id": id}):
+            raise OSError("Could not save the deletion.")
+    return True
+
+
+def _serialized_posts(version, sort_field, reverse):
+    """
+    Returns the JSON body for the list of posts in the requested order,
+    serializing it only on the first request for that order since the
+    posts last changed.
+    Must be called while holding _cache_lock.
+
+    Args:
+        version (str): ETag of the current posts.
+        sort_field (str): Field to sort by, or None to keep list order.
+        reverse (bool): Whether to sort in descending order.
+
+    Returns:
+        bytes: The serialized list of posts.
+    """
+    global _get_cache_version
+    if version != _get_cache_version:
+        _get_cache.clear()
+        _get_cache_version = version
+
+    key = (sort_field, reverse)
+    body = _get_cache.get(key)
+    if body is None:
+        posts = read_posts()
+        if sort_field:
+            posts = sorted(posts, key=itemgetter(sort_field), reverse=reverse)
+        body = _get_cache[key] = orjson.dumps(posts)
+    return body
+
+
+def _query_args(query_string):
+    """
+    Decodes a raw query string into a dict holding the first value of each parameter.
+    """
+    args = {}
+    for key, value in parse_qsl(query_string.decode("utf-8", "replace"), keep_blank_values=True):
+        args.setdefault(key, value)
+    return args
+
+
+@lru_cache(maxsize=128)
+def parse_sort_params(query_string):
+    """
+    Parses and validates the sort parameters of the list endpoint.
+    Results are cached per query string, so repeated URLs skip the parsing.
+
+    Args:
+        query_string (bytes): Raw query string of the request.
+
+    Returns:
+        tuple: Sort field (or None) and whether to sort in descending order.
+
+    Raises:
+        ValueError: If the sort field or direction is not supported.
+    """
+    args = _query_args(query_string)
+    sort_field = args.get('sort') or None
+    sort_direction = (args.get('direction') or 'asc').lower()
+    if sort_field and sort_field not in SORT_FIELDS:
+        raise ValueError(f"Invalid sort field '{sort_field}'.")
+    if sort_direction not in SORT_DIRECTIONS:
+        raise ValueError(f"Invalid sort direction '{sort_direction}'.")
+
+    reverse = bool(sort_field) and sort_direction == 'desc'
+    return sort_field, reverse
+
+
+@lru_cache(maxsize=128)
+def parse_search_params(query_string):
+    """
+    Parses the search terms of the search endpoint.
+    Results are cached per query string, so repeated URLs skip the parsing.
+
+    Args:
+        query_string (bytes): Raw query string of the request.
+
+    Returns:
+        tuple: The casefolded title and content search terms.
+    """
+    args = _query_args(query_string)
+    return args.get('title', '').casefold(), args.get('content', '').casefold()
+
+
+def scan(columns, title_query, content_query):
+    """
+    Filters posts down to those containing both queries.
+    Each non-empty query is applied as one map/compress pass over a flat
+    column, so the substring tests run in C without executing bytecode
+    for every post.
+
+    Args:
+        columns (tuple): Parallel lists of casefolded titles, casefolded contents and posts.
+        title_query (str): Casefolded title search term, or '' for any title.
+        content_query (str): Casefolded content search term, or '' for any content.
+
+    Returns:
+        list: The matching posts, in column order.
+    """
+    titles, contents, posts = columns
+    if title_query:
+        keep = list(map(contains, titles, repeat(title_query)))
+        if content_query:
+            contents = list(compress(contents, keep))
+        posts = list(compress(posts, keep))
+    if content_query:
+        posts = list(compress(posts, map(contains, contents, repeat(content_query))))
+    return posts
+
+
+def _stream_posts(posts):
+    """
+    Serializes a list of posts as a JSON array chunk by chunk, so the whole
+    body never has to be held in memory at once.
+
+    Args:
+        posts (list): List of posts to serialize.
+
+    Yields:
+        bytes: Consecutive parts of the JSON array.
+    """
+    yield b"["
+    for start in range(0, len(posts), STREAM_CHUNK_SIZE):
+        chunk = b",".join(orjson.dumps(post) for post in posts[start:start + STREAM_CHUNK_SIZE])
+        yield chunk if start == 0 else b"," + chunk
+    yield b"]"
+
+
 @app.route('/api/posts', methods=['GET'])
 def get_posts():
     """
@@ -52,30 +889,38 @@ def get_posts():
 
         This endpoint can also sort the posts based on the specified field and direction.
         The query parameters `sort` and `direction` are optional:
-        - `sort`: The field by which to sort the posts (e.g., "title", "content"). If not provided, posts are returned unsorted.
+        - `sort`: The field by which to sort the posts ("title", "content" or "id"). If not provided, posts are returned unsorted.
         - `direction`: The direction to sort in. Can be 'asc' (ascending) or 'desc' (descending). Default is 'asc'.
 
         Example usage:
         - `/api/posts` returns all posts without sorting.
         - `/api/posts?sort=title&direction=desc` returns posts sorted by the title in descending order.
 
+        The response carries an ETag; a request whose `If-None-Match` header
+        matches it gets an empty 304 Not Modified response instead.
+
         Returns:
             JSON: A list of posts (sorted or unsorted based on query params).
+            If `sort` or `direction` is not supported, returns an error with a 400 status code.
         """
-    posts = read_posts()
-
-    sort_field = request.args.get('sort', None)
-    sort_direction = request.args.get('direction', 'asc')
+    try:
+        sort_field, reverse = parse_sort_params(request.query_string)
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
 
-    print("Sort field:", sort_field)
-    print("Sort direction:", sort_direction)
+    if logger.isEnabledFor(logging.DEBUG):
+        logger.debug("sort=%s reverse=%s", sort_field, reverse)
 
-    if sort_field:
-        reverse = (sort_direction == 'desc')
-        print("Reverse:", reverse)
-        posts.sort(key=lambda x: x.get(sort_field, ''), reverse=reverse)
+    with _cache_lock:
+        etag = _posts_etag()
+        if request.if_none_match.contains_weak(etag):
+            response = Response(status=304)
+        else:
+            response = Response(_serialized_posts(etag, sort_field, reverse), mimetype='application/json')
 
-    return jsonify(posts)
+    response.set_etag(etag)
+    response.headers["Cache-Control"] = "private, must-revalidate"
+    return response
 
 
 @app.route('/api/posts', methods=['POST'])
@@ -83,30 +928,27 @@ def add_post():
     """
     Endpoint to add new post.
     Accepts a JSON payload containing 'title' and 'content', validates them,
-    and adds a new post to the JSON file.
+    and records a new post in the change log.
 
     Returns:
         Response: JSON object of the created post with a 201 status code.
-        If 'title' or 'content' is missing, returns an error with a 400 status code.
+        If 'title' or 'content' is missing or not a string, returns an error with a 400 status code.
+        If the post could not be saved in time, returns an error with a 503 status code.
+        If the post could not be saved, returns an error with a 500 status code.
     """
     data = request.get_json()
 
     if not data or not data.get('title') or not data.get('content'):
         return jsonify({"error": "Title and content are required."}), 400
+    if not isinstance(data['title'], str) or not isinstance(data['content'], str):
+        return jsonify({"error": "Title and content must be strings."}), 400
 
-    posts = read_posts()
-
-    new_id = max(post['id'] for post in posts) + 1 if posts else 1
-
-    new_post = {
-        "id": new_id,
-        "title": data["title"],
-        "content": data["content"]
-    }
-
-    posts.append(new_post)
-
-    write_posts(posts)
+    try:
+        new_post = submit_mutation(_add_post, data["title"], data["content"])
+    except TimeoutError as e:
+        return jsonify({"error": str(e)}), 503
+    except OSError as e:
+        return jsonify({"error": str(e)}), 500
 
     return jsonify(new_post), 201
 
@@ -116,7 +958,7 @@ def update_post(id):
     """
     Endpoint to update an existing post.
     Accepts a JSON payload with 'title' and 'content' and updates the post
-    with the given ID in the JSON file.
+    with the given ID in the change log.
 
     Args:
         id (int): ID of the post to be updated.
@@ -124,10 +966,11 @@ def update_post(id):
     Returns:
         Response: JSON object of the updated post with a 200 status code.
         If the post is not found, returns an error with a 404 status code.
-        If 'title' or 'content' is missing, returns an error with a 400 status code.
+        If 'title' or 'content' is missing or not a string, returns an error with a 400 status code.
+        If the post could not be saved in time, returns an error with a 503 status code.
+        If the post could not be saved, returns an error with a 500 status code.
     """
-    posts = read_posts()
-    post = next((post for post in posts if post['id'] == id), None)
+    post = get_post(id)
     if post is None:
         return jsonify({"error": "Post not found"}), 404
 
@@ -137,11 +980,17 @@ def update_post(id):
 
     if not title or not content:
         return jsonify({"error": "Both 'title' and 'content' are required."}), 400
+    if not isinstance(title, str) or not isinstance(content, str):
+        return jsonify({"error": "Both 'title' and 'content' must be strings."}), 400
 
-    post["title"] = title
-    post["content"] = content
-
-    write_posts(posts)
+    try:
+        post = submit_mutation(_update_post, id, title, content)
+    except TimeoutError as e:
+        return jsonify({"error": str(e)}), 503
+    except OSError as e:
+        return jsonify({"error": str(e)}), 500
+    if post is None:
+        return jsonify({"error": "Post not found"}), 404
 
     return jsonify(post), 200
 
@@ -150,7 +999,7 @@ def update_post(id):
 def delete_post(id):
     """
         Endpoint to delete a post by its ID.
-        Removes the post with the given ID from the JSON file.
+        Records the removal of the post with the given ID in the change log.
 
         Args:
             id (int): ID of the post to be deleted.
@@ -158,14 +1007,21 @@ def delete_post(id):
         Returns:
             Response: A success message with a 200 status code.
             If the post is not found, returns an error with a 404 status code.
+            If the deletion could not be saved in time, returns an error with a 503 status code.
+            If the deletion could not be saved, returns an error with a 500 status code.
         """
-    posts = read_posts()
-    post = next((post for post in posts if post['id'] == id), None)
+    post = get_post(id)
     if post is None:
         return jsonify({"error": "Post not found"}), 404
 
-    posts.remove(post)
-    write_posts(posts)
+    try:
+        deleted = submit_mutation(_delete_post, id)
+    except TimeoutError as e:
+        return jsonify({"error": str(e)}), 503
+    except OSError as e:
+        return jsonify({"error": str(e)}), 500
+    if not deleted:
+        return jsonify({"error": "Post not found"}), 404
 
     return jsonify({"message": f"Post with id {id} has been deleted successfully."}), 200
 
@@ -183,29 +1039,29 @@ def search_posts():
     - `/api/posts/search?title=ffirst&content=first` returns posts that match both the title and content search.
 
     Returns:
-        Response: JSON array of matching posts.
+        Response: JSON array of matching posts, streamed in chunks.
     """
-    title_query = request.args.get('title', '').lower()
-    content_query = request.args.get('content', '').lower()
-
-    if '/' in title_query:
-        title_query = title_query.split('/')[0]
-    if '/' in content_query:
-        content_query = content_query.split('/')[0]
+    title_query, content_query = parse_search_params(request.query_string)
 
-    posts = read_posts()
+    with _cache_lock:
+        read_posts()
+        _build_search_index()
+        # Queries of at least three characters narrow the posts down through the
+        # trigram index; the filters below verify each candidate.
+        entries = _search_candidates((title_query, content_query))
+        if entries is None:
+            columns = _get_search_columns()
+        else:
+            columns = tuple(map(list, zip(*entries))) or ([], [], [])
 
-    filtered_posts = [
-        post for post in posts
-        if (title_query in post['title'].lower() if title_query else True) and
-           (content_query in post['content'].lower() if content_query else True)
-    ]
+    filtered_posts = scan(columns, title_query, content_query)
 
-    return jsonify(filtered_posts)
+    return Response(_stream_posts(filtered_posts), mimetype='application/json')
 
 
 if __name__ == '__main__':
     """
-       Starts the Flask application on host 0.0.0.0 and port 5002 in debug mode.
+       Starts the Flask development server on host 0.0.0.0 and port 5002 in debug mode.
+       In production, serve `wsgi:app` with gunicorn instead (see wsgi.py).
        """
     app.run(host="0.0.0.0", port=5002, debug=True)
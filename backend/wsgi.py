@@ -0,0 +1,10 @@
+"""
+WSGI entry point for running the backend with a production server, e.g.:
+
+    gunicorn -w 4 -k gthread --threads 8 -b 0.0.0.0:5002 wsgi:app
+
+Run from the backend directory: posts are stored there in posts.msgpack,
+with pending changes in posts.log and posts.lock serializing writers across
+workers. posts.json is only read once, to migrate older data.
+"""
+from backend_app import app
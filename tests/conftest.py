@@ -0,0 +1,37 @@
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "backend"))
+
+import backend_app  # noqa: E402
+
+
+@pytest.fixture
+def app_module(tmp_path, monkeypatch):
+    """
+    Returns the backend module serving posts from an empty temporary directory,
+    with all in-memory state from earlier tests dropped.
+    """
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.setattr(backend_app, "_cache", None)
+    monkeypatch.setattr(backend_app, "_cache_stamp", None)
+    monkeypatch.setattr(backend_app, "_log_offset", 0)
+    monkeypatch.setattr(backend_app, "_get_cache", {})
+    monkeypatch.setattr(backend_app, "_get_cache_version", None)
+    return backend_app
+
+
+@pytest.fixture
+def client(app_module):
+    return app_module.app.test_client()
+
+
+def reload_from_disk(app_module):
+    """
+    Drops the cache so the next read loads the posts from disk, as a
+    restarted process would.
+    """
+    app_module._cache = None
+    return app_module.read_posts()
@@ -0,0 +1,223 @@
+import json
+import threading
+import time
+
+import msgpack
+import pytest
+
+from conftest import reload_from_disk
+
+
+def add(client, title, content="content"):
+    response = client.post("/api/posts", json={"title": title, "content": content})
+    assert response.status_code == 201
+    return response.get_json()
+
+
+# Change log and persistence
+
+def test_mutations_survive_a_reload(app_module, client):
+    first = add(client, "first")
+    second = add(client, "second")
+    client.put(f"/api/posts/{first['id']}", json={"title": "renamed", "content": "new"})
+    client.delete(f"/api/posts/{second['id']}")
+
+    assert reload_from_disk(app_module) == [{"id": first["id"], "title": "renamed", "content": "new"}]
+
+
+def test_torn_log_line_is_cut_before_appending(app_module, client):
+    client.get("/api/posts")
+    with open("posts.log", "ab") as log:
+        log.write(b'{"op":"add","post":{"id":7,"tit')
+
+    post = add(client, "after crash")
+
+    assert reload_from_disk(app_module) == [post]
+    with open("posts.log", "rb") as log:
+        assert log.read().endswith(b"\n")
+
+
+def test_failed_append_is_rolled_back(app_module, client, monkeypatch):
+    add(client, "kept")
+    with open("posts.log", "rb") as log:
+        before = log.read()
+
+    def failing_fsync(fd):
+        raise OSError("disk full")
+
+    with monkeypatch.context() as patch:
+        patch.setattr(app_module.os, "fsync", failing_fsync)
+        response = client.post("/api/posts", json={"title": "lost", "content": "x"})
+
+    assert response.status_code == 500
+    with open("posts.log", "rb") as log:
+        assert log.read() == before
+    assert add(client, "next")["id"] == 2
+
+
+def test_new_log_lines_from_another_process_are_replayed(app_module, client):
+    add(client, "mine")
+    with open("posts.log", "ab") as log:
+        log.write(b'{"op":"add","post":{"id":5,"title":"theirs","content":"x"}}\n')
+
+    titles = [post["title"] for post in client.get("/api/posts").get_json()]
+
+    assert titles == ["mine", "theirs"]
+
+
+def test_compaction_folds_the_log_into_the_posts_file(app_module, client, monkeypatch):
+    monkeypatch.setattr(app_module, "COMPACT_THRESHOLD", 200)
+    posts = [add(client, f"post {i}") for i in range(5)]
+
+    with open("posts.log", "rb") as log:
+        assert len(log.read()) <= 200
+    assert reload_from_disk(app_module) == posts
+
+
+def test_interrupted_compaction_does_not_duplicate_posts(app_module, client):
+    post = {"id": 1, "title": "once", "content": "x"}
+    with open("posts.msgpack", "wb") as file:
+        file.write(msgpack.packb([post]))
+    with open("posts.log", "wb") as log:
+        log.write(json.dumps({"op": "add", "post": post}).encode() + b"\n")
+
+    assert client.get("/api/posts").get_json() == [post]
+
+
+def test_legacy_json_file_is_migrated(app_module, client, tmp_path):
+    legacy = [{"id": 1, "title": "old", "content": "post"}]
+    (tmp_path / "posts.json").write_text(json.dumps(legacy, indent=4))
+
+    assert client.get("/api/posts").get_json() == legacy
+    with open("posts.msgpack", "rb") as file:
+        assert msgpack.unpackb(file.read()) == legacy
+    assert json.loads((tmp_path / "posts.json").read_text()) == legacy
+
+
+# Validation
+
+@pytest.mark.parametrize("payload", [
+    {"title": 123, "content": "x"},
+    {"title": "x", "content": ["y"]},
+    {"title": "", "content": "y"},
+])
+def test_add_post_rejects_invalid_fields(client, payload):
+    assert client.post("/api/posts", json=payload).status_code == 400
+
+
+def test_update_post_rejects_invalid_fields(client):
+    post = add(client, "title")
+    response = client.put(f"/api/posts/{post['id']}", json={"title": 1, "content": "x"})
+
+    assert response.status_code == 400
+
+
+def test_update_and_delete_unknown_post(client):
+    assert client.put("/api/posts/99", json={"title": "a", "content": "b"}).status_code == 404
+    assert client.delete("/api/posts/99").status_code == 404
+
+
+# Query parameters
+
+@pytest.mark.parametrize("query, status", [
+    ("sort=title", 200),
+    ("sort=id&direction=DESC", 200),
+    ("direction=", 200),
+    ("sort=title&direction=", 200),
+    ("sort=bad", 400),
+    ("sort=id&direction=sideways", 400),
+])
+def test_get_posts_validates_sort_parameters(client, query, status):
+    assert client.get(f"/api/posts?{query}").status_code == status
+
+
+def test_search_ignores_sort_parameters(client):
+    add(client, "first")
+
+    response = client.get("/api/posts/search?title=first&sort=bad&direction=")
+
+    assert response.status_code == 200
+    assert len(response.get_json()) == 1
+
+
+def test_get_posts_sorts(client):
+    for title in ("b", "c", "a"):
+        add(client, title)
+
+    response = client.get("/api/posts?sort=title&direction=desc")
+
+    assert [post["title"] for post in response.get_json()] == ["c", "b", "a"]
+
+
+# Search
+
+def test_search_verifies_trigram_candidates(client):
+    add(client, "abc bcd")
+    match = add(client, "xabcdx")
+
+    assert client.get("/api/posts/search?title=abcd").get_json() == [match]
+
+
+def test_search_short_and_combined_queries(client):
+    first = add(client, "Straße news", "Some Content")
+    second = add(client, "other", "more content/with slash")
+
+    assert client.get("/api/posts/search?title=STRASSE").get_json() == [first]
+    assert client.get("/api/posts/search?title=e").get_json() == [first, second]
+    assert client.get("/api/posts/search?content=t/w").get_json() == [second]
+    assert client.get("/api/posts/search?title=news&content=content").get_json() == [first]
+    assert client.get("/api/posts/search").get_json() == [first, second]
+
+
+def test_search_index_is_built_lazily_and_kept_in_sync(app_module, client):
+    post = add(client, "alpha")
+    client.get("/api/posts")
+    assert app_module._search_index is None
+
+    assert client.get("/api/posts/search?title=alpha").get_json() == [post]
+    client.put(f"/api/posts/{post['id']}", json={"title": "beta", "content": "x"})
+    assert client.get("/api/posts/search?title=alpha").get_json() == []
+    assert len(client.get("/api/posts/search?title=beta").get_json()) == 1
+    client.delete(f"/api/posts/{post['id']}")
+    assert client.get("/api/posts/search?title=beta").get_json() == []
+
+
+# ETag
+
+def test_etag_and_not_modified(client):
+    add(client, "cached")
+    response = client.get("/api/posts")
+    etag = response.headers["ETag"]
+
+    assert client.get("/api/posts", headers={"If-None-Match": etag}).status_code == 304
+    assert client.get("/api/posts", headers={"If-None-Match": f"W/{etag}"}).status_code == 304
+
+    add(client, "changed")
+    response = client.get("/api/posts", headers={"If-None-Match": etag})
+    assert response.status_code == 200
+    assert response.headers["ETag"] != etag
+
+
+# Writer thread
+
+def test_timed_out_mutation_is_not_applied(app_module, client, monkeypatch):
+    monkeypatch.setattr(app_module, "MUTATION_TIMEOUT", 0.2)
+    append_op = app_module.append_op
+
+    def slow_append_op(op):
+        time.sleep(0.5)
+        return append_op(op)
+
+    monkeypatch.setattr(app_module, "append_op", slow_append_op)
+    statuses = []
+    first = threading.Thread(
+        target=lambda: statuses.append(client.post("/api/posts", json={"title": "a", "content": "b"}).status_code))
+    first.start()
+    time.sleep(0.05)
+    second = client.post("/api/posts", json={"title": "c", "content": "d"})
+    first.join()
+    time.sleep(0.7)
+
+    assert statuses == [201]
+    assert second.status_code == 503
+    assert [post["title"] for post in reload_from_disk(app_module)] == ["a"]